@@ -1,16 +1,36 @@
 from __future__ import annotations
 
+import importlib.machinery
+import importlib.util
 import json
+import os
 from pathlib import Path
+import random
 import subprocess
 import sys
 import tempfile
 import unittest
+import unittest.mock
 
 ROOT = Path(__file__).resolve().parents[1]
 CLI = ROOT / "bin" / "autocrop-video"
 
 
+def _load_autocrop_module():
+    module_name = f"autocrop_video_test_{os.getpid()}_{len(sys.modules)}"
+    loader = importlib.machinery.SourceFileLoader(module_name, str(CLI))
+    spec = importlib.util.spec_from_loader(module_name, loader)
+    if spec is None:
+        raise AssertionError("failed to load autocrop-video module spec")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    try:
+        loader.exec_module(module)
+    finally:
+        sys.modules.pop(module_name, None)
+    return module
+
+
 def _make_fixture(path: Path) -> None:
     command = [
         "ffmpeg",
@@ -43,6 +63,43 @@ def _make_fixture(path: Path) -> None:
     subprocess.run(command, check=True)
 
 
+def _make_moving_fixture(path: Path) -> None:
+    command = [
+        "ffmpeg",
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-y",
+        "-f",
+        "lavfi",
+        "-i",
+        "color=c=0x161616:s=640x360:d=40:r=24",
+        "-f",
+        "lavfi",
+        "-i",
+        "testsrc2=s=360x200:d=20:r=24",
+        "-f",
+        "lavfi",
+        "-i",
+        "testsrc2=s=480x270:d=20:r=24",
+        "-filter_complex",
+        (
+            "[0:v]drawbox=x=0:y=0:w=640:h=30:color=0x2f2f2f:t=fill[bg];"
+            "[bg][1:v]overlay=120:70:enable='lt(t,20)'[first];"
+            "[2:v]setpts=PTS+20/TB[late];"
+            "[first][late]overlay=40:40:enable='gte(t,20)':eof_action=pass"
+        ),
+        "-c:v",
+        "libx264",
+        "-pix_fmt",
+        "yuv420p",
+        "-t",
+        "40",
+        str(path),
+    ]
+    subprocess.run(command, check=True)
+
+
 def _probe_dimensions(path: Path) -> tuple[int, int]:
     result = subprocess.run(
         [
@@ -66,15 +123,25 @@ def _probe_dimensions(path: Path) -> tuple[int, int]:
     return int(stream["width"]), int(stream["height"])
 
 
+def _run_cli(cache_dir: Path, *args: str) -> subprocess.CompletedProcess[str]:
+    return subprocess.run(
+        [sys.executable, str(CLI), *args],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=False,
+        env={**os.environ, "AUTOCROP_VIDEO_CACHE_DIR": str(cache_dir)},
+    )
+
+
 class AutocropVideoCliTest(unittest.TestCase):
+    def setUp(self) -> None:
+        cache = tempfile.TemporaryDirectory()
+        self.addCleanup(cache.cleanup)
+        self.cache_dir = Path(cache.name)
+
     def run_cli(self, *args: str) -> subprocess.CompletedProcess[str]:
-        return subprocess.run(
-            [sys.executable, str(CLI), *args],
-            cwd=ROOT,
-            capture_output=True,
-            text=True,
-            check=False,
-        )
+        return _run_cli(self.cache_dir, *args)
 
     def test_detect_reports_expected_bounding_box(self) -> None:
         with tempfile.TemporaryDirectory() as tmp:
@@ -116,6 +183,431 @@ class AutocropVideoCliTest(unittest.TestCase):
             self.assertAlmostEqual(width, 360, delta=10)
             self.assertAlmostEqual(height, 200, delta=10)
 
+    def test_batch_crops_each_input_and_writes_manifest(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp_path = Path(tmp)
+            inputs = tmp_path / "inputs"
+            inputs.mkdir()
+            _make_fixture(inputs / "first.mp4")
+            _make_fixture(inputs / "second.mp4")
+            manifest = tmp_path / "manifest.json"
+
+            result = self.run_cli(
+                "batch",
+                str(inputs),
+                "--output-dir",
+                str(tmp_path / "out"),
+                "--manifest",
+                str(manifest),
+            )
+
+            self.assertEqual(result.returncode, 0, msg=result.stderr)
+            payload = json.loads(manifest.read_text(encoding="utf-8"))
+            self.assertEqual(payload["counts"], {"cropped": 2})
+            for entry in payload["results"]:
+                self.assertAlmostEqual(entry["detection"]["bbox"]["width"], 360, delta=10)
+                width, height = _probe_dimensions(Path(entry["output"]))
+                self.assertAlmostEqual(width, 360, delta=10)
+                self.assertAlmostEqual(height, 200, delta=10)
+
+    def test_detect_timeline_tracks_a_moved_video(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            fixture = Path(tmp) / "moving.mp4"
+            _make_moving_fixture(fixture)
+
+            result = self.run_cli("detect", str(fixture), "--timeline", "--window-seconds", "8")
+
+            self.assertEqual(result.returncode, 0, msg=result.stderr)
+            segments = json.loads(result.stdout)["segments"]
+            self.assertEqual(len(segments), 2)
+            self.assertAlmostEqual(segments[0]["end"], 20.0, delta=1.0)
+            self.assertAlmostEqual(segments[0]["bbox"]["x"], 120, delta=10)
+            self.assertAlmostEqual(segments[1]["bbox"]["x"], 40, delta=10)
+            self.assertAlmostEqual(segments[1]["bbox"]["width"], 480, delta=10)
+
+    def test_bench_scores_synthetic_corpus_and_reuses_clips(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            corpus = Path(tmp) / "corpus"
+            args = [
+                "bench",
+                "--corpus-dir",
+                str(corpus),
+                "--scene",
+                "centered",
+                "--scene",
+                "noisy",
+                "--resolution",
+                "640x360",
+                "--detection-width",
+                "160",
+                "--repeat",
+                "1",
+                "--min-iou",
+                "0.9",
+            ]
+
+            result = self.run_cli(*args)
+
+            self.assertEqual(result.returncode, 0, msg=result.stderr)
+            payload = json.loads(result.stdout)
+            self.assertEqual([entry["scene"] for entry in payload["results"]], ["centered", "noisy"])
+            for entry in payload["results"]:
+                self.assertGreaterEqual(entry["iou"], 0.9)
+                self.assertEqual(
+                    set(entry["timings"]),
+                    {"probe", "extract", "activity", "edges", "score", "total"},
+                )
+            clips = sorted(path.name for path in corpus.iterdir())
+            self.assertEqual(clips, ["centered-640x360-6s.mp4", "noisy-640x360-6s.mp4"])
+            mtimes = [path.stat().st_mtime_ns for path in sorted(corpus.iterdir())]
+
+            rerun = self.run_cli(*args[:-2], "--min-iou", "1.01")
+
+            self.assertEqual(rerun.returncode, 1)
+            self.assertIn("below 1.01", rerun.stderr)
+            self.assertEqual([path.stat().st_mtime_ns for path in sorted(corpus.iterdir())], mtimes)
+
+
+class AutocropVideoBatchTest(unittest.TestCase):
+    def test_batch_skips_inputs_with_up_to_date_outputs(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp_path = Path(tmp)
+            source = tmp_path / "recording.mov"
+            source.write_bytes(b"not decoded")
+            (tmp_path / "notes.txt").write_text("ignored", encoding="utf-8")
+            output = tmp_path / "recording-cropped.mp4"
+            output.write_bytes(b"already cropped")
+            os.utime(source, (1_000, 1_000))
+
+            result = _run_cli(tmp_path / "cache", "batch", str(tmp_path))
+
+            self.assertEqual(result.returncode, 0, msg=result.stderr)
+            payload = json.loads(result.stdout)
+            self.assertEqual(payload["counts"], {"skipped": 1})
+            self.assertEqual(
+                payload["results"],
+                [
+                    {
+                        "input": str(source),
+                        "output": str(output),
+                        "status": "skipped",
+                        "detection": None,
+                        "error": None,
+                    }
+                ],
+            )
+
+    def test_plan_batch_rejects_colliding_outputs(self) -> None:
+        autocrop = _load_autocrop_module()
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp_path = Path(tmp)
+            for name in ["clip.mp4", "clip.mov"]:
+                (tmp_path / name).write_bytes(b"")
+
+            inputs = autocrop._collect_batch_inputs([str(tmp_path / "clip.*")], suffix="-cropped")
+
+            self.assertEqual([path.name for path in inputs], ["clip.mov", "clip.mp4"])
+            with self.assertRaisesRegex(autocrop.CliError, "same output"):
+                autocrop._plan_batch(inputs, output_dir=None, suffix="-cropped")
+
+    def test_failed_bench_clip_leaves_no_partial_file(self) -> None:
+        autocrop = _load_autocrop_module()
+
+        def failing_fixture_command(*_args, output: Path, **_kwargs) -> list[str]:
+            script = f"import sys; open({str(output)!r}, 'wb').write(b'half'); sys.exit('encoder crashed')"
+            return [sys.executable, "-c", script]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            corpus = Path(tmp) / "corpus"
+            with unittest.mock.patch.object(autocrop, "_bench_fixture_command", failing_fixture_command):
+                with self.assertRaisesRegex(autocrop.CliError, "encoder crashed"):
+                    autocrop._generate_bench_corpus(corpus, scenes=["centered"], resolutions=[(640, 360)], duration=1.0)
+
+            self.assertEqual(list(corpus.iterdir()), [])
+
+
+class AutocropVideoCacheTest(unittest.TestCase):
+    def test_detect_returns_cached_result_until_file_changes(self) -> None:
+        autocrop = _load_autocrop_module()
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp_path = Path(tmp)
+            cache_dir = tmp_path / "cache"
+            source = tmp_path / "recording.mp4"
+            source.write_bytes(b"not decoded")
+            cached = autocrop.DetectionResult(
+                bbox=autocrop.BoundingBox(x=120, y=70, width=360, height=200),
+                source=str(source.resolve()),
+                detection_width=320,
+                sampled_frames=24,
+                scaled_width=320,
+                scaled_height=180,
+                sampling="scan",
+            )
+            with unittest.mock.patch.dict(os.environ, {"AUTOCROP_VIDEO_CACHE_DIR": str(cache_dir)}):
+                key = autocrop._detection_cache_key(
+                    source,
+                    detection_width=320,
+                    sample_count=24,
+                    sampling="auto",
+                )
+                autocrop._store_cached_detection(key, cached)
+
+            result = _run_cli(cache_dir, "detect", str(source), "--format", "crop")
+
+            self.assertEqual(result.returncode, 0, msg=result.stderr)
+            self.assertEqual(result.stdout.strip(), "crop=360:200:120:70")
+
+            uncached = _run_cli(cache_dir, "detect", str(source), "--format", "crop", "--no-cache")
+            self.assertEqual(uncached.returncode, 1)
+
+            source.write_bytes(b"changed contents")
+            pruned = _run_cli(cache_dir, "cache", "prune")
+
+            self.assertEqual(pruned.returncode, 0, msg=pruned.stderr)
+            self.assertEqual(json.loads(pruned.stdout)["removed"], 1)
+            self.assertEqual(list(cache_dir.iterdir()), [])
+
+
+class AutocropVideoEncodePlanTest(unittest.TestCase):
+    def test_plan_encode_picks_copy_fast_and_segment_modes(self) -> None:
+        autocrop = _load_autocrop_module()
+        info = autocrop.VideoInfo(width=1920, height=1080, duration=600.0)
+        full = autocrop.BoundingBox(x=0, y=0, width=1920, height=1080)
+        inner = autocrop.BoundingBox(x=120, y=70, width=1280, height=720)
+
+        copy = autocrop.plan_encode(info, full, preset="medium", segment_parallel=True, cores=16)
+        fast = autocrop.plan_encode(info, inner, preset="veryfast", segment_parallel=False, cores=16)
+        segment = autocrop.plan_encode(info, inner, preset="medium", segment_parallel=True, cores=16)
+        short = autocrop.plan_encode(
+            autocrop.VideoInfo(width=1920, height=1080, duration=20.0),
+            inner,
+            preset="medium",
+            segment_parallel=True,
+            cores=16,
+        )
+
+        self.assertEqual(copy.mode, "copy")
+        self.assertIsNone(copy.expected_speedup)
+        self.assertEqual((fast.mode, fast.threads, fast.expected_speedup), ("fast", 16, 4.0))
+        self.assertEqual((segment.mode, segment.segments, segment.threads), ("segment", 16, 1))
+        self.assertEqual(segment.expected_speedup, 2.0)
+        self.assertEqual((short.mode, short.segments), ("standard", 1))
+
+
+class AutocropVideoProfileTest(unittest.TestCase):
+    def test_numpy_profiles_match_pure_python_fallback(self) -> None:
+        autocrop = _load_autocrop_module()
+        if autocrop.np is None:
+            self.skipTest("NumPy not installed")
+
+        width, height, frame_count = 48, 27, 9
+        rng = random.Random(7)
+        frames = [bytes(rng.randrange(256) for _ in range(width * height)) for _ in range(frame_count)]
+        numpy_profiles = autocrop.ProfileAccumulator(width, height, use_numpy=True)
+        python_profiles = autocrop.ProfileAccumulator(width, height, use_numpy=False)
+        for frame in frames:
+            numpy_profiles.add(memoryview(frame))
+            python_profiles.add(memoryview(frame))
+
+        self.assertEqual(numpy_profiles.frame_count, frame_count)
+        for name in ["activity_profiles", "edge_profiles"]:
+            expected = getattr(python_profiles, name)()
+            actual = getattr(numpy_profiles, name)()
+            for expected_profile, actual_profile in zip(expected, actual):
+                self.assertEqual(len(actual_profile), len(expected_profile))
+                for expected_value, actual_value in zip(expected_profile, actual_profile):
+                    self.assertAlmostEqual(actual_value, expected_value, places=9)
+
+    def test_iter_raw_frames_streams_fixed_size_frames_from_pipe(self) -> None:
+        autocrop = _load_autocrop_module()
+        script = "import sys; sys.stdout.buffer.write(bytes(range(10)) + b'xy')"
+
+        frames = [
+            bytes(frame)
+            for frame in autocrop._iter_raw_frames([sys.executable, "-c", script], 5)
+        ]
+
+        self.assertEqual(frames, [bytes(range(5)), bytes(range(5, 10))])
+
+    def test_iter_raw_frames_surfaces_command_errors(self) -> None:
+        autocrop = _load_autocrop_module()
+        script = "import sys; sys.stderr.write('decode failed'); sys.exit(1)"
+
+        with self.assertRaisesRegex(autocrop.CliError, "decode failed"):
+            list(autocrop._iter_raw_frames([sys.executable, "-c", script], 5))
+
+    def test_iter_raw_frames_does_not_block_on_noisy_stderr(self) -> None:
+        autocrop = _load_autocrop_module()
+        # Far more than a pipe buffer holds, written before any frame reaches stdout.
+        script = "import sys; sys.stderr.write('w' * (1 << 20)); sys.stdout.buffer.write(bytes(10))"
+
+        frames = list(autocrop._iter_raw_frames([sys.executable, "-c", script], 5))
+
+        self.assertEqual(len(frames), 2)
+
+
+class AutocropVideoBoxScoringTest(unittest.TestCase):
+    def test_summed_area_table_gives_rectangle_sums(self) -> None:
+        autocrop = _load_autocrop_module()
+        if autocrop.np is None:
+            self.skipTest("NumPy not installed")
+
+        values = autocrop.np.arange(20, dtype=float).reshape(4, 5)
+        table = autocrop._summed_area_table(values)
+
+        self.assertEqual(table.shape, (5, 6))
+        self.assertEqual(table[3, 4] - table[1, 4] - table[3, 1] + table[1, 1], values[1:3, 1:4].sum())
+
+    def test_box_from_maps_prefers_bordered_region_over_stray_motion(self) -> None:
+        autocrop = _load_autocrop_module()
+        if autocrop.np is None:
+            self.skipTest("NumPy not installed")
+
+        np = autocrop.np
+        width, height = 80, 48
+        activity = np.full((height, width), 0.5)
+        activity[10:38, 20:70] = 12.0
+        # Uneven motion inside the video and a moving cursor out in the chrome.
+        activity[10:38, 45:70] = 3.0
+        activity[40:44, 4:8] = 20.0
+        dx = np.full((height, width - 1), 1.0)
+        dy = np.full((height - 1, width), 1.0)
+        dx[10:38, [19, 69]] = 40.0
+        dy[[9, 37], 20:70] = 40.0
+
+        bbox = autocrop._box_from_maps(
+            activity,
+            dx,
+            dy,
+            scaled_width=width,
+            scaled_height=height,
+            info=autocrop.VideoInfo(width=width * 4, height=height * 4, duration=10.0),
+        )
+
+        self.assertEqual((bbox.x, bbox.y, bbox.width, bbox.height), (80, 40, 200, 112))
+
+    def test_box_from_maps_keeps_evenly_moving_video_when_chrome_is_thin(self) -> None:
+        autocrop = _load_autocrop_module()
+        if autocrop.np is None:
+            self.skipTest("NumPy not installed")
+
+        np = autocrop.np
+        width, height = 80, 48
+        # A video filling all but a thin toolbar, with one fast strip inside gentler motion.
+        # The toolbar is under a tenth of the frame, so a whole-frame 10th percentile lands
+        # inside the video and leaves only the fast strip above the noise floor.
+        activity = np.full((height, width), 4.0)
+        activity[:4] = 0.2
+        activity[4:, 30:40] = 30.0
+        dx = np.full((height, width - 1), 1.0)
+        dy = np.full((height - 1, width), 1.0)
+        dy[3] = 40.0
+        dx[4:, [29, 39]] = 20.0
+
+        self.assertEqual(autocrop._border_noise(activity), 0.2)
+        self.assertGreater(float(np.percentile(activity, 10)), autocrop.BOX_ACTIVITY_FLOOR)
+        bbox = autocrop._box_from_maps(
+            activity,
+            dx,
+            dy,
+            scaled_width=width,
+            scaled_height=height,
+            info=autocrop.VideoInfo(width=width * 4, height=height * 4, duration=10.0),
+        )
+
+        self.assertEqual((bbox.x, bbox.y, bbox.width, bbox.height), (0, 16, 320, 176))
+
+
+class AutocropVideoSamplingTest(unittest.TestCase):
+    def test_seek_timestamps_are_evenly_spaced_inside_trimmed_range(self) -> None:
+        autocrop = _load_autocrop_module()
+        info = autocrop.VideoInfo(width=640, height=360, duration=100.0)
+
+        timestamps = autocrop._sample_timestamps(info, 9)
+
+        self.assertEqual(len(timestamps), 9)
+        self.assertAlmostEqual(timestamps[0], 10.0)
+        self.assertAlmostEqual(timestamps[-1], 90.0)
+        self.assertEqual(autocrop._resolve_sampling("auto", info), "seek")
+        short = autocrop.VideoInfo(width=640, height=360, duration=4.0)
+        self.assertEqual(autocrop._resolve_sampling("auto", short), "scan")
+        self.assertEqual(autocrop._resolve_sampling("keyframe", short), "keyframe")
+
+    def test_iter_seek_frames_keeps_command_order_and_drops_short_reads(self) -> None:
+        autocrop = _load_autocrop_module()
+
+        def command(delay: float, payload: bytes) -> list[str]:
+            script = f"import sys, time; time.sleep({delay}); sys.stdout.buffer.write({payload!r})"
+            return [sys.executable, "-c", script]
+
+        commands = [
+            command(0.3, b"aaaa"),
+            command(0.0, b"bb"),
+            command(0.0, b"cccc"),
+            command(0.1, b"dddd"),
+        ]
+
+        frames = list(autocrop._iter_seek_frames(commands, 4, jobs=2))
+
+        self.assertEqual(frames, [(0, b"aaaa"), (2, b"cccc"), (3, b"dddd")])
+
+
+class AutocropVideoTimelineTest(unittest.TestCase):
+    def test_sliding_window_matches_accumulator_over_same_frames(self) -> None:
+        autocrop = _load_autocrop_module()
+        if autocrop.np is None:
+            self.skipTest("NumPy not installed")
+
+        width, height = 40, 24
+        rng = random.Random(11)
+        frames = [bytes(rng.randrange(256) for _ in range(width * height)) for _ in range(14)]
+        window = autocrop.SlidingProfileWindow(width, height, 6)
+        self.assertIsNone(window.last_edges)
+        for frame in frames:
+            window.add(frame)
+        col_edges, row_edges = window.last_edges
+        self.assertEqual((col_edges.shape, row_edges.shape), ((width - 1,), (height - 1,)))
+        expected = autocrop.ProfileAccumulator(width, height, use_numpy=True)
+        for frame in frames[-6:]:
+            expected.add(frame)
+
+        for expected_map, actual_map in zip(expected.maps(), window.maps()):
+            self.assertEqual(actual_map.shape, expected_map.shape)
+            self.assertTrue(autocrop.np.allclose(actual_map, expected_map))
+
+    def test_change_point_follows_border_edges(self) -> None:
+        autocrop = _load_autocrop_module()
+        if autocrop.np is None:
+            self.skipTest("NumPy not installed")
+
+        np = autocrop.np
+        before = autocrop.BoundingBox(x=20, y=10, width=40, height=20)
+        after = autocrop.BoundingBox(x=4, y=4, width=80, height=40)
+        frame_edges = []
+        for index in range(20):
+            col_edges = np.zeros(99, dtype=np.int64)
+            row_edges = np.zeros(59, dtype=np.int64)
+            box = before if index < 13 else after
+            col_edges[[box.x - 1, box.x + box.width - 1]] = 500
+            row_edges[[box.y - 1, box.y + box.height - 1]] = 500
+            frame_edges.append((float(index), col_edges, row_edges))
+
+        change = autocrop._refine_change_point(
+            frame_edges,
+            before,
+            after,
+            search_start=0.0,
+            search_end=19.0,
+            fallback=-1.0,
+            scale=(1.0, 1.0),
+        )
+
+        self.assertEqual(change, 12.5)
+        self.assertEqual(
+            autocrop._group_timeline_windows([before, None, before, after, after]),
+            [[0, 1, 2], [3, 4]],
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
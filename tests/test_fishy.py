@@ -1,5 +1,10 @@
 from __future__ import annotations
 
+import gzip
+import http.client
+import importlib.machinery
+import importlib.util
+import json
 import os
 from pathlib import Path
 import subprocess
@@ -7,13 +12,36 @@ import sys
 import tempfile
 import time
 import unittest
+from urllib.parse import urlsplit
+from urllib.error import HTTPError
 from urllib.request import urlopen
 
 ROOT = Path(__file__).resolve().parents[1]
 CLI = ROOT / "bin" / "fishy"
 
 
+def _load_fishy_module():
+    module_name = f"fishy_test_{os.getpid()}_{len(sys.modules)}"
+    loader = importlib.machinery.SourceFileLoader(module_name, str(CLI))
+    spec = importlib.util.spec_from_loader(module_name, loader)
+    if spec is None:
+        raise AssertionError("failed to load fishy module spec")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    try:
+        loader.exec_module(module)
+    finally:
+        sys.modules.pop(module_name, None)
+    return module
+
+
 class FishyCliTest(unittest.TestCase):
+    def setUp(self) -> None:
+        # Keep a developer's seeded Mermaid bundle or SVG cache out of the tests.
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.cache_dir = Path(cache_dir.name)
+
     def test_serves_mermaid_from_stdin(self) -> None:
         diagram = "graph TD\\n    A[Start] --> B{Decide}\\n    B -->|Yes| C[Ship]\\n"
         proc = self._start_cli(diagram)
@@ -43,6 +71,34 @@ class FishyCliTest(unittest.TestCase):
             source_body = response.read().decode("utf-8")
         self.assertEqual(source_body, diagram)
 
+    def test_page_is_gzipped_and_revalidated_with_etag(self) -> None:
+        proc = self._start_cli("graph TD\n    A[Start] --> B[Done]\n")
+        self.addCleanup(self._stop_process, proc)
+
+        _, url = self._wait_for_url(proc)
+        address = urlsplit(url)
+        connection = http.client.HTTPConnection(address.hostname, address.port, timeout=5)
+        self.addCleanup(connection.close)
+
+        connection.request("GET", "/", headers={"Accept-Encoding": "gzip"})
+        response = connection.getresponse()
+        compressed = response.read()
+        etag = response.getheader("ETag")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader("Content-Encoding"), "gzip")
+        self.assertIn("A[Start]", gzip.decompress(compressed).decode("utf-8"))
+        self.assertTrue(etag)
+
+        connection.request("GET", "/", headers={"If-None-Match": etag})
+        response = connection.getresponse()
+        self.assertEqual(response.status, 304)
+        self.assertEqual(response.read(), b"")
+
+        connection.request("GET", "/")
+        response = connection.getresponse()
+        self.assertIsNone(response.getheader("Content-Encoding"))
+        self.assertEqual(response.read(), gzip.decompress(compressed))
+
     def test_strips_markdown_fence_from_stdin(self) -> None:
         fenced_diagram = (
             "```mermaid\n"
@@ -117,13 +173,287 @@ class FishyCliTest(unittest.TestCase):
             self.assertIn("/version?ts=", body)
             self.assertEqual(source_body, markdown_source)
 
+            first_etag = self._read_etag(url)
+            self.assertEqual(self._read_etag(url), first_etag)
+
             time.sleep(0.01)
             source_file.write_text(markdown_source + "\n<!-- changed -->\n", encoding="utf-8")
             with urlopen(f"{url}/version", timeout=5) as response:
                 second_version = response.read().decode("utf-8")
+            with urlopen(f"{url}/source.mmd", timeout=5) as response:
+                changed_source = response.read().decode("utf-8")
+
+            self.assertNotEqual(first_version, second_version)
+            self.assertIn("<!-- changed -->", changed_source)
+            self.assertNotEqual(self._read_etag(url), first_etag)
+
+    def test_diagrams_json_hashes_change_only_for_edited_blocks(self) -> None:
+        first = "# One\n\n```mermaid\ngraph TD\n    A --> B\n```\n"
+        second = "# Two\n\n```mermaid\nsequenceDiagram\n    A->>B: hi\n```\n"
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source_file = Path(temp_dir) / "design.md"
+            source_file.write_text(first + second, encoding="utf-8")
+            proc = self._start_cli_for_source_file(source_file)
+            self.addCleanup(self._stop_process, proc)
+
+            _, url = self._wait_for_url(proc)
+            with urlopen(url, timeout=5) as response:
+                body = response.read().decode("utf-8")
+            with urlopen(f"{url}/diagrams.json", timeout=5) as response:
+                before = json.loads(response.read().decode("utf-8"))
+
+            time.sleep(0.01)
+            source_file.write_text(first + second.replace("hi", "hello"), encoding="utf-8")
+            with urlopen(f"{url}/diagrams.json", timeout=5) as response:
+                after = json.loads(response.read().decode("utf-8"))
 
+        self.assertEqual([diagram["title"] for diagram in before["diagrams"]], ["One", "Two"])
+        self.assertIn(f'data-diagram-hash="{before["diagrams"][0]["hash"]}"', body)
+        self.assertIn("mermaid.render", body)
+        self.assertNotEqual(before["version"], after["version"])
+        self.assertEqual(after["diagrams"][0]["hash"], before["diagrams"][0]["hash"])
+        self.assertNotEqual(after["diagrams"][1]["hash"], before["diagrams"][1]["hash"])
+        self.assertEqual(after["diagrams"][1]["source"], "sequenceDiagram\n    A->>B: hello")
+
+    def test_source_file_events_push_version_on_change(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source_file = Path(temp_dir) / "design.md"
+            source_file.write_text("```mermaid\ngraph TD\n    A --> B\n```\n", encoding="utf-8")
+            proc = self._start_cli_for_source_file(source_file)
+            self.addCleanup(self._stop_process, proc)
+
+            _, url = self._wait_for_url(proc)
+            with urlopen(url, timeout=5) as response:
+                body = response.read().decode("utf-8")
+            with urlopen(f"{url}/events", timeout=5) as events:
+                self.assertEqual(events.headers["Content-Type"], "text/event-stream")
+                first_version = self._read_event(events)
+                with urlopen(f"{url}/version", timeout=5) as response:
+                    self.assertEqual(first_version, response.read().decode("utf-8"))
+
+                time.sleep(0.01)
+                source_file.write_text("```mermaid\ngraph TD\n    A --> C\n```\n", encoding="utf-8")
+                second_version = self._read_event(events)
+
+            self.assertIn("new EventSource(`${BASE_PATH}/events`)", body)
             self.assertNotEqual(first_version, second_version)
 
+    def test_prerender_ships_cached_svg_and_reuses_it_across_runs(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            temp_path = Path(temp_dir)
+            source_file = temp_path / "design.md"
+            source_file.write_text("# Flow\n\n```mermaid\ngraph TD\n    A --> B\n```\n", encoding="utf-8")
+            calls_log = temp_path / "calls.log"
+            runner = temp_path / "mmdc"
+            runner.write_text(
+                "#!/usr/bin/env python3\n"
+                "import os, sys\n"
+                "args = sys.argv[1:]\n"
+                "if args == ['--version']:\n"
+                "    print(os.environ.get('FAKE_MMDC_VERSION', '10.0.0'))\n"
+                "    sys.exit(0)\n"
+                f"with open({str(calls_log)!r}, 'a') as log:\n"
+                "    log.write(' '.join(args) + '\\n')\n"
+                "output = args[args.index('--output') + 1]\n"
+                "svg_id = args[args.index('--svgId') + 1]\n"
+                "with open(output, 'w') as handle:\n"
+                "    handle.write(f'<?xml version=\"1.0\"?><svg id=\"{svg_id}\"><text>fake</text></svg>')\n",
+                encoding="utf-8",
+            )
+            runner.chmod(0o755)
+            env = {"FISHY_MERMAID_RENDERER": str(runner)}
+
+            proc = self._start_cli_for_source_file(source_file, "--prerender", env=env)
+            self.addCleanup(self._stop_process, proc)
+            _, url = self._wait_for_url(proc)
+            body = self._wait_for_prerendered_page(url)
+            with urlopen(f"{url}/diagrams.json", timeout=5) as response:
+                document = json.loads(response.read().decode("utf-8"))
+            self._stop_process(proc)
+
+            second = self._start_cli_for_source_file(source_file, "--prerender", env=env)
+            self.addCleanup(self._stop_process, second)
+            _, second_url = self._wait_for_url(second)
+            with urlopen(second_url, timeout=5) as response:
+                second_body = response.read().decode("utf-8")
+            self._stop_process(second)
+            cached = list(self.cache_dir.rglob("*.svg"))
+
+            # A different mermaid-cli version must not reuse SVGs rendered by the old one.
+            upgraded = self._start_cli_for_source_file(
+                source_file, "--prerender", env={**env, "FAKE_MMDC_VERSION": "11.0.0"}
+            )
+            self.addCleanup(self._stop_process, upgraded)
+            _, upgraded_url = self._wait_for_url(upgraded)
+            self._wait_for_prerendered_page(upgraded_url)
+            calls = calls_log.read_text(encoding="utf-8").splitlines()
+            upgraded_cached = list(self.cache_dir.rglob("*.svg"))
+
+        diagram_hash = document["diagrams"][0]["hash"]
+        self.assertIn(f'<svg id="fishy-{diagram_hash}"><text>fake</text></svg>', body)
+        self.assertNotIn("<?xml", body)
+        self.assertIn('.mermaid:not([data-prerendered])', body)
+        self.assertTrue(document["diagrams"][0]["svg"].startswith("<svg"))
+        self.assertIn('data-prerendered="true"', second_body)
+        self.assertEqual(len(calls), 2)
+        self.assertIn("--configFile", calls[0])
+        self.assertEqual(len(cached), 1)
+        self.assertEqual(len(upgraded_cached), 2)
+
+    def test_serves_seeded_mermaid_bundle_with_immutable_precompressed_assets(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            package_dir = Path(temp_dir) / "mermaid"
+            chunk_dir = package_dir / "dist" / "chunks" / "mermaid.esm.min"
+            chunk_dir.mkdir(parents=True)
+            (package_dir / "package.json").write_text('{"name": "mermaid", "version": "11.9.0"}', encoding="utf-8")
+            (package_dir / "dist" / "mermaid.esm.min.mjs").write_text(
+                'import{a as m}from"./chunks/mermaid.esm.min/chunk-A1.mjs";export{m as default};',
+                encoding="utf-8",
+            )
+            chunk = 'import("./chunk-B2.mjs");export const a={initialize(){}};' + "/*pad*/" * 400
+            (chunk_dir / "chunk-A1.mjs").write_text(chunk, encoding="utf-8")
+            (chunk_dir / "chunk-B2.mjs").write_text("export const b=1;", encoding="utf-8")
+            (chunk_dir / "unused.mjs").write_text("export const c=1;", encoding="utf-8")
+
+            proc = self._start_cli("graph TD\n    A --> B\n", "--mermaid-bundle", str(package_dir))
+            self.addCleanup(self._stop_process, proc)
+            _, url = self._wait_for_url(proc)
+            with urlopen(url, timeout=5) as response:
+                body = response.read().decode("utf-8")
+
+            parsed = urlsplit(url)
+            connection = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=5)
+            self.addCleanup(connection.close)
+            asset_root = "/assets/mermaid/11.9.0"
+            connection.request("GET", f"{asset_root}/chunks/mermaid.esm.min/chunk-A1.mjs", headers={"Accept-Encoding": "gzip"})
+            response = connection.getresponse()
+            compressed_chunk = response.read()
+            headers = dict(response.getheaders())
+            statuses = {}
+            for path in (
+                f"{asset_root}/mermaid.esm.min.mjs",
+                f"{asset_root}/chunks/mermaid.esm.min/chunk-B2.mjs",
+                f"{asset_root}/chunks/mermaid.esm.min/unused.mjs",
+                "/assets/mermaid/11.8.0/mermaid.esm.min.mjs",
+                f"{asset_root}/../11.9.0/manifest.json",
+            ):
+                connection.request("GET", path)
+                response = connection.getresponse()
+                response.read()
+                statuses[path] = response.status
+
+        self.assertIn(f"{asset_root}/mermaid.esm.min.mjs", body)
+        self.assertNotIn("cdn.jsdelivr.net", body)
+        self.assertEqual(headers["Content-Encoding"], "gzip")
+        self.assertEqual(headers["Cache-Control"], "public, max-age=31536000, immutable")
+        self.assertEqual(headers["Content-Type"], "text/javascript; charset=utf-8")
+        self.assertEqual(gzip.decompress(compressed_chunk).decode("utf-8"), chunk)
+        self.assertEqual(list(statuses.values()), [200, 200, 404, 404, 404])
+        self.assertTrue((self.cache_dir / "mermaid" / "11.9.0" / "chunks" / "mermaid.esm.min" / "chunk-A1.mjs.gz").is_file())
+
+        # The cached copy keeps serving once the seed is gone.
+        proc = self._start_cli("graph TD\n    A --> B\n")
+        self.addCleanup(self._stop_process, proc)
+        _, url = self._wait_for_url(proc)
+        with urlopen(url, timeout=5) as response:
+            self.assertIn(f"{asset_root}/mermaid.esm.min.mjs", response.read().decode("utf-8"))
+
+    def test_unusable_discovered_mermaid_package_falls_back_to_cdn(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            project = Path(temp_dir)
+            package_dir = project / "node_modules" / "mermaid"
+            package_dir.mkdir(parents=True)
+            # Mermaid 8 ships no ESM bundle, so there is nothing to seed from.
+            (package_dir / "package.json").write_text('{"name": "mermaid", "version": "8.14.0"}', encoding="utf-8")
+            command = [sys.executable, str(CLI), "--no-open", "--port", "0"]
+
+            proc = subprocess.Popen(
+                command,
+                cwd=project,
+                env=self._cli_env(),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+            )
+            self.addCleanup(self._stop_process, proc)
+            assert proc.stdin is not None
+            proc.stdin.write("graph TD\n    A --> B\n")
+            proc.stdin.close()
+            _, url = self._wait_for_url(proc)
+            with urlopen(url, timeout=5) as response:
+                body = response.read().decode("utf-8")
+
+            explicit = subprocess.run(
+                [*command, "--mermaid-bundle", str(package_dir)],
+                cwd=project,
+                env=self._cli_env(),
+                input="graph TD\n    A --> B\n",
+                capture_output=True,
+                text=True,
+                check=False,
+            )
+
+        self.assertIn("cdn.jsdelivr.net/npm/mermaid", body)
+        self.assertEqual(explicit.returncode, 1)
+        self.assertIn("no mermaid.esm.min.mjs found", explicit.stderr)
+
+    def test_serve_indexes_markdown_tree_and_routes_each_document(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            (root / "design").mkdir()
+            (root / ".git").mkdir()
+            (root / "design" / "flow chart.md").write_text("# Flow\n\n```mermaid\ngraph TD\n    A --> B\n```\n", encoding="utf-8")
+            (root / "notes.md").write_text("# Notes\n\nNo diagrams here.\n", encoding="utf-8")
+            (root / ".git" / "hidden.md").write_text("```mermaid\ngraph TD\n    X --> Y\n```\n", encoding="utf-8")
+            proc = subprocess.Popen(
+                [sys.executable, str(CLI), "serve", str(root), "--no-open", "--port", "0"],
+                cwd=ROOT,
+                env=self._cli_env(),
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+            )
+            self.addCleanup(self._stop_process, proc)
+            _, url = self._wait_for_url(proc)
+
+            with urlopen(url, timeout=5) as response:
+                index = response.read().decode("utf-8")
+            document_url = f"{url}/docs/design/flow%20chart.md"
+            with urlopen(document_url, timeout=5) as response:
+                redirected_url = response.geturl()
+                page = response.read().decode("utf-8")
+            with urlopen(f"{document_url}/diagrams.json", timeout=5) as response:
+                diagrams = json.loads(response.read().decode("utf-8"))
+            with urlopen(f"{url}/events", timeout=5) as events:
+                first_tree_version = self._read_event(events)
+                with urlopen(f"{document_url}/events", timeout=5) as document_events:
+                    first_document_version = self._read_event(document_events)
+                    (root / "notes.md").write_text("```mermaid\ngraph LR\n    C --> D\n```\n", encoding="utf-8")
+                    second_tree_version = self._read_event(events)
+                    time.sleep(0.01)
+                    (root / "design" / "flow chart.md").write_text("```mermaid\ngraph TD\n    A --> C\n```\n", encoding="utf-8")
+                    second_document_version = self._read_event(document_events)
+            with urlopen(url, timeout=5) as response:
+                updated_index = response.read().decode("utf-8")
+
+            with self.assertRaises(HTTPError) as missing:
+                urlopen(f"{url}/docs/missing.md/", timeout=5)
+
+        self.assertIn('href="/docs/design/flow%20chart.md/"', index)
+        self.assertIn("notes.md<span class=\"count\">no Mermaid blocks</span>", index)
+        self.assertNotIn("hidden.md", index)
+        self.assertTrue(redirected_url.endswith("/docs/design/flow%20chart.md/"))
+        self.assertIn('const BASE_PATH = "/docs/design/flow%20chart.md";', page)
+        self.assertIn('href="/docs/design/flow%20chart.md/source.mmd"', page)
+        self.assertIn("<h1>design/flow chart.md</h1>", page)
+        self.assertEqual(diagrams["diagrams"][0]["title"], "Flow")
+        self.assertNotEqual(first_tree_version, second_tree_version)
+        self.assertNotEqual(first_document_version, second_document_version)
+        self.assertIn('href="/docs/notes.md/"', updated_index)
+        self.assertEqual(missing.exception.code, 404)
+
     def test_rejects_empty_input(self) -> None:
         env = os.environ.copy()
         result = subprocess.run(
@@ -139,10 +469,10 @@ class FishyCliTest(unittest.TestCase):
         self.assertEqual(result.returncode, 1)
         self.assertIn("Mermaid definition is empty", result.stderr)
 
-    def _start_cli(self, diagram: str) -> subprocess.Popen[str]:
-        env = os.environ.copy()
+    def _start_cli(self, diagram: str, *extra_args: str) -> subprocess.Popen[str]:
+        env = self._cli_env()
         proc = subprocess.Popen(
-            [sys.executable, str(CLI), "--no-open", "--port", "0"],
+            [sys.executable, str(CLI), "--no-open", "--port", "0", *extra_args],
             cwd=ROOT,
             env=env,
             stdin=subprocess.PIPE,
@@ -155,8 +485,13 @@ class FishyCliTest(unittest.TestCase):
         proc.stdin.close()
         return proc
 
-    def _start_cli_for_source_file(self, source_file: Path) -> subprocess.Popen[str]:
-        env = os.environ.copy()
+    def _start_cli_for_source_file(
+        self,
+        source_file: Path,
+        *extra_args: str,
+        env: dict[str, str] | None = None,
+    ) -> subprocess.Popen[str]:
+        env = self._cli_env(env)
         return subprocess.Popen(
             [
                 sys.executable,
@@ -166,6 +501,7 @@ class FishyCliTest(unittest.TestCase):
                 "--no-open",
                 "--port",
                 "0",
+                *extra_args,
             ],
             cwd=ROOT,
             env=env,
@@ -175,6 +511,13 @@ class FishyCliTest(unittest.TestCase):
             text=True,
         )
 
+    def _cli_env(self, overrides: dict[str, str] | None = None) -> dict[str, str]:
+        env = os.environ.copy()
+        env.pop("FISHY_MERMAID_BUNDLE", None)
+        env["FISHY_CACHE_DIR"] = str(self.cache_dir)
+        env.update(overrides or {})
+        return env
+
     def _wait_for_url(self, proc: subprocess.Popen[str]) -> tuple[str, str]:
         assert proc.stdout is not None
 
@@ -192,6 +535,30 @@ class FishyCliTest(unittest.TestCase):
 
         self.fail("timed out waiting for fishy URL")
 
+    def _wait_for_prerendered_page(self, url: str) -> str:
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            with urlopen(url, timeout=5) as response:
+                body = response.read().decode("utf-8")
+            if 'data-prerendered="true"' in body:
+                return body
+            time.sleep(0.05)
+        self.fail("timed out waiting for a pre-rendered page")
+
+    def _read_etag(self, url: str) -> str:
+        with urlopen(f"{url}/source.mmd", timeout=5) as response:
+            return response.headers["ETag"]
+
+    def _read_event(self, response) -> str:
+        event = ""
+        for raw_line in response:
+            line = raw_line.decode("utf-8").rstrip("\n")
+            if line.startswith("event: "):
+                event = line.removeprefix("event: ")
+            elif line.startswith("data: ") and event == "version":
+                return line.removeprefix("data: ")
+        self.fail("event stream closed before a version event")
+
     def _stop_process(self, proc: subprocess.Popen[str]) -> None:
         try:
             if proc.poll() is None:
@@ -210,5 +577,72 @@ class FishyCliTest(unittest.TestCase):
                 proc.stderr.close()
 
 
+class FishyBlockIndexTest(unittest.TestCase):
+    def test_tail_edit_rescans_after_last_unchanged_block(self) -> None:
+        fishy = _load_fishy_module()
+        sections = [f"## Part {index}\n\n```mermaid\ngraph TD\n    A{index} --> B{index}\n```\n\n" for index in range(50)]
+        document = "```python\nprint('x')\n```\n\n```mermaid\ngraph LR\n    U --> V\n```\n\n" + "".join(sections)
+        index = fishy.MermaidBlockIndex()
+        index.update(document.encode("utf-8"))
+        self.assertEqual(index.rescan_offset, 0)
+
+        edited = document.replace("A49 --> B49", "A49 --> C49") + "```mermaid\ngraph TD\n    Z --> Y\n```"
+        diagrams = index.update(edited.encode("utf-8"))
+        self.assertGreater(index.rescan_offset, len(document) * 0.9)
+        self.assertEqual(diagrams, fishy.MermaidBlockIndex().update(edited.encode("utf-8")))
+        self.assertEqual(diagrams[-2], fishy.MermaidDiagram(title="Part 49", source="graph TD\n    A49 --> C49"))
+        self.assertEqual(diagrams[0].title, "Mermaid block 1")
+
+        # Text appended to a closing fence without a trailing newline reopens that block.
+        reopened = edited + "x\n## After\n"
+        diagrams = index.update(reopened.encode("utf-8"))
+        self.assertEqual(diagrams, fishy.MermaidBlockIndex().update(reopened.encode("utf-8")))
+        self.assertEqual(len(diagrams), 51)
+
+        diagrams = index.update(("# Top\n" + reopened).encode("utf-8"))
+        self.assertEqual(index.rescan_offset, 0)
+        self.assertEqual(diagrams[0].title, "Top")
+
+    def test_first_difference_finds_offset_inside_and_past_chunks(self) -> None:
+        fishy = _load_fishy_module()
+        base = bytes(range(256)) * 1024
+        self.assertEqual(fishy._first_difference(base, base), len(base))
+        self.assertEqual(fishy._first_difference(base, base[:1000]), 1000)
+        changed = bytearray(base)
+        changed[200_001] ^= 0xFF
+        self.assertEqual(fishy._first_difference(base, bytes(changed)), 200_001)
+
+
+class FishySvgPrerendererTest(unittest.TestCase):
+    def test_undecodable_svg_counts_as_failed_render(self) -> None:
+        fishy = _load_fishy_module()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            temp_path = Path(temp_dir)
+            runner = temp_path / "mmdc"
+            runner.write_text(
+                "#!/usr/bin/env python3\n"
+                "import sys\n"
+                "args = sys.argv[1:]\n"
+                "if args == ['--version']:\n"
+                "    print('10.0.0')\n"
+                "    sys.exit(0)\n"
+                "with open(args[args.index('--output') + 1], 'wb') as handle:\n"
+                "    handle.write(b'<svg>\\xff</svg>')\n",
+                encoding="utf-8",
+            )
+            runner.chmod(0o755)
+            prerenderer = fishy.SvgPrerenderer(str(runner), temp_path / "svg")
+            self.addCleanup(prerenderer.shutdown)
+            diagram = fishy.MermaidDiagram(title="Flow", source="graph TD\n    A --> B")
+            key = prerenderer._cache_key(diagram.source)
+
+            prerenderer._render(key, fishy._diagram_hash(diagram), diagram.source)
+
+            self.assertEqual(prerenderer._pending, set())
+            self.assertEqual(prerenderer._failed, {key})
+            self.assertEqual(prerenderer.cached_svgs([diagram]), {})
+            self.assertEqual(prerenderer._pending, set())
+
+
 if __name__ == "__main__":
     unittest.main()
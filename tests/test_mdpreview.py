@@ -1,5 +1,9 @@
 from __future__ import annotations
 
+import importlib.machinery
+import importlib.util
+import json
+import os
 from pathlib import Path
 import subprocess
 import sys
@@ -13,7 +17,27 @@ ROOT = Path(__file__).resolve().parents[1]
 CLI = ROOT / "bin" / "mdpreview"
 
 
+def _load_mdpreview_module():
+    module_name = f"mdpreview_test_{os.getpid()}_{len(sys.modules)}"
+    loader = importlib.machinery.SourceFileLoader(module_name, str(CLI))
+    spec = importlib.util.spec_from_loader(module_name, loader)
+    if spec is None:
+        raise AssertionError("failed to load mdpreview module spec")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    try:
+        loader.exec_module(module)
+    finally:
+        sys.modules.pop(module_name, None)
+    return module
+
+
 class MdPreviewCliTest(unittest.TestCase):
+    def setUp(self) -> None:
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.cache_dir = Path(cache_dir.name)
+
     def test_serves_markdown_from_stdin_with_plugins(self) -> None:
         markdown = (
             "# Project Plan\n\n"
@@ -59,10 +83,96 @@ class MdPreviewCliTest(unittest.TestCase):
             self.assertIn('id="local-file"', body)
             self.assertIn("<p>Paragraph.</p>", body)
 
+    def test_serves_cached_render_without_markdown_it(self) -> None:
+        markdown = "# Cached\n\nParagraph.\n"
+        proc = self._start_cli(["--no-open", "--port", "0"], stdin_text=markdown)
+        _, url = self._wait_for_url(proc)
+        with urlopen(url, timeout=5) as response:
+            cold_body = response.read().decode("utf-8")
+        self._stop_process(proc)
+
+        [entry] = self.cache_dir.glob("html/*/*.html")
+        self.assertIn('<h1 id="cached">', entry.read_text(encoding="utf-8"))
+        entry.write_text("<p>From the cache.</p>\n", encoding="utf-8")
+
+        proc = self._start_cli(["--no-open", "--port", "0"], stdin_text=markdown)
+        self.addCleanup(self._stop_process, proc)
+        _, url = self._wait_for_url(proc)
+        with urlopen(url, timeout=5) as response:
+            warm_body = response.read().decode("utf-8")
+
+        self.assertIn("<p>Paragraph.</p>", cold_body)
+        self.assertIn("<p>From the cache.</p>", warm_body)
+        self.assertNotIn("<p>Paragraph.</p>", warm_body)
+
+        uncached = self._start_cli(["--no-open", "--port", "0", "--no-cache"], stdin_text=markdown)
+        self.addCleanup(self._stop_process, uncached)
+        _, url = self._wait_for_url(uncached)
+        with urlopen(url, timeout=5) as response:
+            self.assertIn("<p>Paragraph.</p>", response.read().decode("utf-8"))
+
+    def test_watch_pushes_patch_for_changed_block(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            source_path = Path(tmp) / "notes.md"
+            source_path.write_text("# Notes\n\nFirst paragraph.\n\nSecond paragraph.\n", encoding="utf-8")
+
+            proc = self._start_cli(["--no-open", "--port", "0", "--watch", str(source_path)], stdin_text=None)
+            self.addCleanup(self._stop_process, proc)
+            _, url = self._wait_for_url(proc)
+            with urlopen(url, timeout=5) as response:
+                body = response.read().decode("utf-8")
+
+            with urlopen(f"{url}/events", timeout=5) as events:
+                version = self._read_event(events, "version")
+                time.sleep(0.01)
+                source_path.write_text("# Notes\n\nFirst paragraph.\n\nSecond, edited.\n", encoding="utf-8")
+                patch = json.loads(self._read_event(events, "patch"))
+            with urlopen(f"{url}/source.md", timeout=5) as response:
+                source_body = response.read().decode("utf-8")
+
+        self.assertIn('<div class="md-block" data-block-id="3"><p>Second paragraph.</p>', body)
+        self.assertIn('new EventSource("/events")', body)
+        self.assertEqual(patch["base"], int(version))
+        self.assertEqual(patch["version"], int(version) + 1)
+        self.assertEqual([block["html"] for block in patch["blocks"]], ["<p>First paragraph.</p>\n", "<p>Second, edited.</p>\n"])
+        self.assertEqual((patch["start"], patch["delete"]), (1, 2))
+        self.assertIn("Second, edited.", source_body)
+
+    def test_watch_requires_file_path(self) -> None:
+        result = subprocess.run(
+            [sys.executable, str(CLI), "--no-open", "--watch"],
+            cwd=ROOT,
+            env=self._cli_env(),
+            input="# Notes\n",
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("--watch needs a Markdown file path", result.stderr)
+
+    def test_bench_reports_phase_timings(self) -> None:
+        result = subprocess.run(
+            [sys.executable, str(CLI), "bench", "--sections", "20", "--repeat", "1"],
+            cwd=ROOT,
+            env=self._cli_env(),
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        payload = json.loads(result.stdout)
+        self.assertEqual(payload["lines"], 240)
+        self.assertEqual(set(payload["seconds"]), {"parse", "plain_render", "decorate", "render", "overhead"})
+        self.assertGreater(payload["seconds"]["decorate"], 0)
+
     def test_rejects_empty_input(self) -> None:
         result = subprocess.run(
             [sys.executable, str(CLI), "--no-open"],
             cwd=ROOT,
+            env=self._cli_env(),
             stdin=subprocess.DEVNULL,
             capture_output=True,
             text=True,
@@ -81,6 +191,7 @@ class MdPreviewCliTest(unittest.TestCase):
         proc = subprocess.Popen(
             [sys.executable, str(CLI), *args],
             cwd=ROOT,
+            env=self._cli_env(),
             stdin=subprocess.PIPE if stdin_text is not None else subprocess.DEVNULL,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
@@ -92,6 +203,9 @@ class MdPreviewCliTest(unittest.TestCase):
             proc.stdin.close()
         return proc
 
+    def _cli_env(self) -> dict[str, str]:
+        return {**os.environ, "MDPREVIEW_CACHE_DIR": str(self.cache_dir)}
+
     def _wait_for_url(self, proc: subprocess.Popen[str]) -> tuple[str, str]:
         assert proc.stdout is not None
 
@@ -109,6 +223,16 @@ class MdPreviewCliTest(unittest.TestCase):
 
         self.fail("timed out waiting for mdpreview URL")
 
+    def _read_event(self, response, name: str) -> str:
+        event = ""
+        for raw_line in response:
+            line = raw_line.decode("utf-8").rstrip("\n")
+            if line.startswith("event: "):
+                event = line.removeprefix("event: ")
+            elif line.startswith("data: ") and event == name:
+                return line.removeprefix("data: ")
+        self.fail(f"event stream closed before a {name} event")
+
     def _stop_process(self, proc: subprocess.Popen[str]) -> None:
         try:
             if proc.poll() is None:
@@ -127,5 +251,74 @@ class MdPreviewCliTest(unittest.TestCase):
                 proc.stderr.close()
 
 
+class RenderCacheTest(unittest.TestCase):
+    def test_evicts_least_recently_used_entries(self) -> None:
+        mdpreview = _load_mdpreview_module()
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = mdpreview.RenderCache(Path(tmp), "fingerprint", max_bytes=250)
+            for source in ["a", "b"]:
+                cache.store(source, f"<p>{source}</p>".ljust(100))
+                os.utime(cache._cache_path(cache.key(source)), ns=(0, 0))
+            # A hit makes "a" the most recently used entry, so storing "c" evicts "b".
+            self.assertIsNotNone(cache.lookup("a"))
+            cache.store("c", "<p>c</p>".ljust(100))
+
+            self.assertIsNotNone(cache.lookup("a"))
+            self.assertIsNone(cache.lookup("b"))
+            self.assertIsNotNone(cache.lookup("c"))
+            other = mdpreview.RenderCache(Path(tmp), "other-plugins")
+            self.assertIsNone(other.lookup("a"))
+
+
+class IncrementalRendererTest(unittest.TestCase):
+    def test_updates_match_full_render(self) -> None:
+        mdpreview = _load_mdpreview_module()
+        renderer = mdpreview.IncrementalRenderer(mdpreview._build_renderer())
+        source = "".join(f"## Part {index}\n\nText {index} with [link](https://example.com).\n\n" for index in range(20))
+        renderer.render_all(source)
+        edits = [
+            source.replace("Text 10 ", "Text ten "),
+            source.replace("Text 10 ", "Text ten ").replace("## Part 3\n", "## Part 3\n\n- [x] done\n"),
+            source.replace("Text 10 ", "Text ten ").replace("## Part 3\n", "## Part 19\n"),
+            "```\nunclosed\n\n" + source,
+        ]
+
+        patches = []
+        for edit in edits:
+            before = renderer.blocks
+            start, delete, blocks = renderer.update(edit)
+            patched = before[:start] + blocks + before[start + delete :]
+            self.assertEqual("".join(block.html for block in patched), mdpreview._build_renderer().render(edit))
+            patches.append((start, delete, len(blocks)))
+
+        self.assertEqual(patches[0], (20, 3, 3))
+        self.assertEqual(patches[1][0], 6)
+        # A duplicate heading renumbers slugs further down the page, so the whole page is re-rendered.
+        self.assertEqual(patches[2][:2], (0, 41))
+        self.assertEqual(patches[3], (0, 40, 1))
+
+        # Joining the definition's first line onto the list leaves no definition behind.
+        source = "- item\n   - nested\n\n[multi\nlabel]: /u\n\nSee [multi label].\n"
+        edit = source.replace("nested\n\n", "nested\n")
+        renderer.render_all(source)
+        before = renderer.blocks
+        start, delete, blocks = renderer.update(edit)
+        patched = before[:start] + blocks + before[start + delete :]
+        self.assertEqual("".join(block.html for block in patched), mdpreview._build_renderer().render(edit))
+        self.assertNotIn("<a ", "".join(block.html for block in patched))
+
+        # Form feeds, U+2028 and lone carriage returns must not shift the line numbering.
+        for source, edit in [
+            ("x\x0cy\n# H\n", "x\x0cy\n# H\n\n"),
+            ("a\u2028b\n\n# H\n\nc\n", "a\u2028b\n\n# H\n\nc d\n"),
+            ("p\rq\n\n# H\n", "p\rq\n\n# H\n\nr\n"),
+        ]:
+            renderer.render_all(source)
+            before = renderer.blocks
+            start, delete, blocks = renderer.update(edit)
+            patched = before[:start] + blocks + before[start + delete :]
+            self.assertEqual("".join(block.html for block in patched), mdpreview._build_renderer().render(edit))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -1377,9 +1377,640 @@ class TokemonCliTest(unittest.TestCase):
                 user_version = conn.execute("PRAGMA user_version").fetchone()[0]
                 indexed_rows = conn.execute("SELECT total_tokens FROM usage_records ORDER BY total_tokens").fetchall()
 
-            self.assertEqual(user_version, 2)
+            self.assertEqual(user_version, 3)
             self.assertEqual(indexed_rows, [(80,)])
 
+    def test_timings_report_phase_breakdown_and_work_counters(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp_path = Path(tmp)
+            sessions_root = tmp_path / "codex-sessions"
+            index_path = tmp_path / "tokemon-index.sqlite3"
+            session_path = sessions_root / "2026/02/03/session.jsonl"
+
+            _write_jsonl(
+                session_path,
+                [
+                    {
+                        "timestamp": "2026-02-03T09:00:00-08:00",
+                        "type": "session_meta",
+                        "payload": {"cwd": "/repo/demo", "id": "codex-session-1"},
+                    },
+                    {
+                        "timestamp": "2026-02-03T09:10:00-08:00",
+                        "type": "event_msg",
+                        "payload": {
+                            "type": "token_count",
+                            "info": {"total_token_usage": {"input_tokens": 80, "total_tokens": 80}},
+                        },
+                    },
+                ],
+            )
+
+            env = {
+                "TOKEMON_CODEX_SESSIONS_ROOT": str(sessions_root),
+                "TOKEMON_CODEX_ARCHIVED_ROOT": str(tmp_path / "codex-archived"),
+                "TOKEMON_CLAUDE_PROJECTS_ROOT": str(tmp_path / "claude-projects"),
+                "TOKEMON_INDEX_PATH": str(index_path),
+            }
+            args = ["2026-02-03", "2026-02-03", "--provider", "codex", "--format", "json", "--timings"]
+
+            cold = self.run_cli(args, env)
+            self.assertEqual(cold.returncode, 0, msg=cold.stderr)
+            cold_timings = json.loads(cold.stdout)["timings"]
+            self.assertGreaterEqual(cold_timings["wall_ms"], 0)
+            for phase in ["codex_files", "collect_file_states", "refresh_index", "load_snapshots", "aggregate_rows"]:
+                self.assertIn(phase, cold_timings["phases_ms"])
+            self.assertEqual(cold_timings["counters"]["files_stat"], 1)
+            self.assertEqual(cold_timings["counters"]["files_rescanned"], 1)
+            self.assertEqual(cold_timings["counters"]["bytes_parsed"], session_path.stat().st_size)
+            self.assertEqual(cold_timings["counters"]["rows_read"], 1)
+            self.assertEqual(cold_timings["counters"]["records_aggregated"], 1)
+
+            warm = self.run_cli(args, env)
+            self.assertEqual(warm.returncode, 0, msg=warm.stderr)
+            warm_counters = json.loads(warm.stdout)["timings"]["counters"]
+            self.assertEqual(warm_counters["files_rescanned"], 0)
+            self.assertEqual(warm_counters["bytes_parsed"], 0)
+            self.assertEqual(warm_counters["rows_read"], 1)
+
+            traced_csv = self.run_cli(
+                ["2026-02-03", "2026-02-03", "--provider", "codex", "--format", "csv"],
+                {**env, "TOKEMON_TRACE": "1"},
+            )
+            self.assertEqual(traced_csv.returncode, 0, msg=traced_csv.stderr)
+            self.assertEqual(list(csv.DictReader(traced_csv.stdout.splitlines()))[0]["total_tokens"], "80")
+            prefix = "tokemon timings: "
+            self.assertTrue(traced_csv.stderr.startswith(prefix), msg=traced_csv.stderr)
+            stderr_timings = json.loads(traced_csv.stderr[len(prefix) :])
+            self.assertEqual(stderr_timings["counters"]["records_aggregated"], 1)
+
+            untraced = self.run_cli(["2026-02-03", "2026-02-03", "--provider", "codex", "--format", "json"], env)
+            self.assertEqual(untraced.returncode, 0, msg=untraced.stderr)
+            self.assertNotIn("timings", json.loads(untraced.stdout))
+            self.assertEqual(untraced.stderr, "")
+
+    def test_connect_index_skips_schema_ddl_when_user_version_matches(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            index_path = Path(tmp) / "tokemon-index.sqlite3"
+            tokemon = _load_tokemon_module()
+
+            with mock.patch.dict(os.environ, {"TOKEMON_INDEX_PATH": str(index_path)}, clear=False):
+                first = tokemon._connect_index()
+                self.assertIsNotNone(first)
+                first.close()
+
+                with mock.patch.object(
+                    tokemon,
+                    "_create_index_schema",
+                    side_effect=AssertionError("unexpected schema DDL"),
+                ):
+                    second = tokemon._connect_index()
+                self.assertIsNotNone(second)
+                second.close()
+
+    def test_json_report_startup_defers_format_and_fallback_imports(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp_path = Path(tmp)
+            env = os.environ.copy()
+            env.update(
+                {
+                    "TOKEMON_CODEX_SESSIONS_ROOT": str(tmp_path / "codex-sessions"),
+                    "TOKEMON_CODEX_ARCHIVED_ROOT": str(tmp_path / "codex-archived"),
+                    "TOKEMON_CLAUDE_PROJECTS_ROOT": str(tmp_path / "claude-projects"),
+                    "TOKEMON_DISABLE_INDEX": "1",
+                }
+            )
+
+            def imported_modules(args: list[str]) -> set[str]:
+                result = subprocess.run(
+                    [sys.executable, "-X", "importtime", *args],
+                    cwd=ROOT,
+                    env=env,
+                    capture_output=True,
+                    text=True,
+                    check=False,
+                )
+                self.assertEqual(result.returncode, 0, msg=result.stderr)
+                return {
+                    line.rsplit("|", 1)[1].strip()
+                    for line in result.stderr.splitlines()
+                    if line.startswith("import time:") and "|" in line
+                }
+
+            baseline = imported_modules(["-c", "pass"])
+            report = imported_modules([str(CLI), "2026-02-03", "2026-02-03", "--format", "json"])
+
+            for module_name in ["csv", "sqlite3", "calendar", "dataclasses"]:
+                if module_name in baseline:
+                    continue
+                self.assertNotIn(module_name, report)
+
+    def test_cold_start_overhead_stays_within_budget(self) -> None:
+        budget_ms = float(os.environ.get("TOKEMON_STARTUP_BUDGET_MS", "250"))
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp_path = Path(tmp)
+            env = os.environ.copy()
+            env.update(
+                {
+                    "TOKEMON_CODEX_SESSIONS_ROOT": str(tmp_path / "codex-sessions"),
+                    "TOKEMON_CODEX_ARCHIVED_ROOT": str(tmp_path / "codex-archived"),
+                    "TOKEMON_CLAUDE_PROJECTS_ROOT": str(tmp_path / "claude-projects"),
+                    "TOKEMON_INDEX_PATH": str(tmp_path / "tokemon-index.sqlite3"),
+                }
+            )
+
+            def best_wall_ms(args: list[str]) -> float:
+                best = float("inf")
+                for _ in range(5):
+                    started = time_module.perf_counter()
+                    result = subprocess.run(args, cwd=ROOT, env=env, capture_output=True, check=False)
+                    elapsed = (time_module.perf_counter() - started) * 1000
+                    self.assertEqual(result.returncode, 0, msg=result.stderr)
+                    best = min(best, elapsed)
+                return best
+
+            interpreter_ms = best_wall_ms([sys.executable, "-c", "pass"])
+            report_ms = best_wall_ms([sys.executable, str(CLI), "week", "--format", "json"])
+
+            self.assertLess(
+                report_ms - interpreter_ms,
+                budget_ms,
+                msg=f"tokemon startup overhead {report_ms - interpreter_ms:.1f}ms exceeds {budget_ms:.0f}ms budget",
+            )
+
+    def test_top_ranks_heaviest_sessions_exactly_and_with_sketch(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp_path = Path(tmp)
+            sessions_root = tmp_path / "codex-sessions"
+
+            for session_id, workspace, totals in [
+                ("session-small", "/repo/a", [10, 30]),
+                ("session-large", "/repo/b", [100, 500]),
+                ("session-medium", "/repo/a", [50, 200]),
+            ]:
+                rows = [
+                    {
+                        "timestamp": "2026-02-03T09:00:00-08:00",
+                        "type": "session_meta",
+                        "payload": {"cwd": workspace, "id": session_id},
+                    }
+                ]
+                for minute, total in enumerate(totals, start=1):
+                    rows.append(
+                        {
+                            "timestamp": f"2026-02-03T09:{minute:02d}:00-08:00",
+                            "type": "event_msg",
+                            "payload": {
+                                "type": "token_count",
+                                "info": {"total_token_usage": {"input_tokens": total, "total_tokens": total}},
+                            },
+                        }
+                    )
+                _write_jsonl(sessions_root / f"2026/02/03/{session_id}.jsonl", rows)
+
+            env = {
+                "TOKEMON_CODEX_SESSIONS_ROOT": str(sessions_root),
+                "TOKEMON_CODEX_ARCHIVED_ROOT": str(tmp_path / "codex-archived"),
+                "TOKEMON_CLAUDE_PROJECTS_ROOT": str(tmp_path / "claude-projects"),
+                "TOKEMON_INDEX_PATH": str(tmp_path / "tokemon-index.sqlite3"),
+            }
+
+            exact = self.run_cli(["top", "2026-02-03", "2026-02-03", "--k", "2", "--format", "json"], env)
+            self.assertEqual(exact.returncode, 0, msg=exact.stderr)
+            payload = json.loads(exact.stdout)
+            self.assertFalse(payload["approximate"])
+            self.assertEqual(
+                [(row["rank"], row["session"], row["total_tokens"]) for row in payload["rows"]],
+                [(1, "session-large", 500), (2, "session-medium", 200)],
+            )
+
+            sketched = self.run_cli(
+                ["top", "2026-02-03", "2026-02-03", "--k", "2", "--capacity", "2"],
+                {**env, "TOKEMON_DISABLE_INDEX": "1"},
+            )
+            self.assertEqual(sketched.returncode, 0, msg=sketched.stderr)
+            sketched_rows = list(csv.DictReader(sketched.stdout.splitlines()))
+            self.assertEqual(sketched_rows[0]["session"], "session-large")
+            self.assertEqual(sketched_rows[0]["total_tokens"], "500")
+            self.assertEqual(sketched_rows[0]["error_bound"], "0")
+
+            by_workspace = self.run_cli(
+                ["top", "2026-02-03", "2026-02-03", "--by", "workspace", "--format", "json"], env
+            )
+            self.assertEqual(by_workspace.returncode, 0, msg=by_workspace.stderr)
+            self.assertEqual(
+                [(row["workspace"], row["total_tokens"]) for row in json.loads(by_workspace.stdout)["rows"]],
+                [("/repo/b", 500), ("/repo/a", 230)],
+            )
+
+            invalid = self.run_cli(["top", "week", "--k", "0"], env)
+            self.assertEqual(invalid.returncode, 2)
+            self.assertIn("--k", invalid.stderr)
+
+    def test_space_saving_counter_keeps_heavy_hitters_within_error_bound(self) -> None:
+        tokemon = _load_tokemon_module()
+        sketch = tokemon.SpaceSavingCounter(capacity=4)
+        true_totals: dict[str, int] = {}
+        stream = [("heavy-a", 50), ("heavy-b", 40)] * 20
+        stream += [(f"noise-{index}", 1) for index in range(200)]
+        stream += [("heavy-a", 50), ("heavy-b", 40)] * 5
+        for key, total in stream:
+            true_totals[key] = true_totals.get(key, 0) + total
+            sketch.add(key, {"total_tokens": total})
+
+        self.assertLessEqual(len(sketch.metrics), 4)
+        for key in ["heavy-a", "heavy-b"]:
+            self.assertIn(key, sketch.metrics)
+            estimate = sketch.metrics[key]["total_tokens"]
+            self.assertGreaterEqual(estimate, true_totals[key])
+            self.assertLessEqual(estimate - sketch.errors[key], true_totals[key])
+
+    def test_stats_reports_per_event_quantiles_and_histograms(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp_path = Path(tmp)
+            sessions_root = tmp_path / "codex-sessions"
+            rows = [
+                {
+                    "timestamp": "2026-02-03T09:00:00-08:00",
+                    "type": "session_meta",
+                    "payload": {"cwd": "/repo/demo", "id": "codex-session-1"},
+                }
+            ]
+            running_total = 0
+            for minute in range(1, 101):
+                running_total += minute
+                rows.append(
+                    {
+                        "timestamp": (datetime(2026, 2, 3, 10) + timedelta(minutes=minute)).isoformat() + "-08:00",
+                        "type": "event_msg",
+                        "payload": {
+                            "type": "token_count",
+                            "info": {
+                                "total_token_usage": {
+                                    "input_tokens": running_total,
+                                    "total_tokens": running_total,
+                                }
+                            },
+                        },
+                    }
+                )
+            _write_jsonl(sessions_root / "2026/02/03/session.jsonl", rows)
+
+            env = {
+                "TOKEMON_CODEX_SESSIONS_ROOT": str(sessions_root),
+                "TOKEMON_CODEX_ARCHIVED_ROOT": str(tmp_path / "codex-archived"),
+                "TOKEMON_CLAUDE_PROJECTS_ROOT": str(tmp_path / "claude-projects"),
+                "TOKEMON_INDEX_PATH": str(tmp_path / "tokemon-index.sqlite3"),
+            }
+
+            result = self.run_cli(
+                ["2026-02-03", "2026-02-03", "--sum-by", "daily", "--stats", "--format", "json"],
+                env,
+            )
+            self.assertEqual(result.returncode, 0, msg=result.stderr)
+            payload = json.loads(result.stdout)
+            self.assertEqual(payload["histogram_lower_bounds"][:3], [0, 1, 10])
+            self.assertEqual(len(payload["rows"]), 1)
+            row = payload["rows"][0]
+            self.assertEqual(row["events"], 100)
+            self.assertEqual(row["input_tokens"], 5050)
+            # Per-event deltas are 1..100, so the quantiles land within 1% of 50/95/99.
+            self.assertAlmostEqual(row["input_tokens_p50"], 50, delta=1)
+            self.assertAlmostEqual(row["input_tokens_p95"], 95, delta=1)
+            self.assertAlmostEqual(row["input_tokens_p99"], 99, delta=1)
+            self.assertEqual(row["output_tokens_p99"], 0)
+            self.assertEqual(row["histograms"]["input_tokens"][:4], [0, 9, 90, 1])
+
+            csv_result = self.run_cli(["2026-02-03", "2026-02-03", "--sum-by", "daily", "--stats"], env)
+            self.assertEqual(csv_result.returncode, 0, msg=csv_result.stderr)
+            csv_rows = list(csv.DictReader(csv_result.stdout.splitlines()))
+            self.assertEqual(csv_rows[0]["events"], "100")
+            self.assertIn("total_tokens_p95", csv_rows[0])
+            self.assertNotIn("histograms", csv_rows[0])
+
+    def test_quantile_sketch_merge_matches_single_sketch(self) -> None:
+        tokemon = _load_tokemon_module()
+        combined = tokemon.QuantileSketch()
+        left = tokemon.QuantileSketch()
+        right = tokemon.QuantileSketch()
+        values = [0, 0] + [value * value for value in range(1, 500)]
+        for index, value in enumerate(values):
+            combined.add(value)
+            (left if index % 2 else right).add(value)
+        left.merge(right)
+
+        self.assertEqual(left.count, len(values))
+        ordered = sorted(values)
+        for q in [0.0, 0.5, 0.95, 0.99]:
+            self.assertEqual(left.quantile(q), combined.quantile(q))
+            exact = ordered[int(q * (len(ordered) - 1))]
+            self.assertLessEqual(abs(left.quantile(q) - exact), exact * combined.relative_accuracy + 1e-9)
+        with self.assertRaises(ValueError):
+            left.merge(tokemon.QuantileSketch(relative_accuracy=0.05))
+
+    def test_codex_cli_seals_archived_files_and_keeps_resumed_sessions_exact(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp_path = Path(tmp)
+            sessions_root = tmp_path / "codex-sessions"
+            archived_root = tmp_path / "codex-archived"
+            index_path = tmp_path / "tokemon-index.sqlite3"
+            archived_path = archived_root / "rollout-2026-02-03T09-00-00.jsonl"
+            idle_path = sessions_root / "2026/02/03/idle.jsonl"
+            resumed_path = sessions_root / "2026/02/03/resumed.jsonl"
+
+            def token_row(timestamp: str, total: int) -> dict:
+                return {
+                    "timestamp": timestamp,
+                    "type": "event_msg",
+                    "payload": {
+                        "type": "token_count",
+                        "info": {"total_token_usage": {"input_tokens": total, "total_tokens": total}},
+                    },
+                }
+
+            _write_jsonl(
+                archived_path,
+                [
+                    {"type": "session_meta", "payload": {"cwd": "/repo/demo", "id": "codex-session-1"}},
+                    token_row("2026-02-03T09:05:00-08:00", 40),
+                    token_row("2026-02-03T09:05:30-08:00", 60),
+                    token_row("2026-02-03T09:10:00-08:00", 100),
+                ],
+            )
+            _write_jsonl(
+                idle_path,
+                [
+                    {"type": "session_meta", "payload": {"cwd": "/repo/idle", "id": "codex-session-2"}},
+                    token_row("2026-02-03T11:00:00-08:00", 7),
+                ],
+            )
+            old_mtime = time_module.time() - 30 * 86_400
+            os.utime(idle_path, (old_mtime, old_mtime))
+
+            env = {
+                "TOKEMON_CODEX_SESSIONS_ROOT": str(sessions_root),
+                "TOKEMON_CODEX_ARCHIVED_ROOT": str(archived_root),
+                "TOKEMON_CLAUDE_PROJECTS_ROOT": str(tmp_path / "claude-projects"),
+                "TOKEMON_INDEX_PATH": str(index_path),
+            }
+            args = ["2026-02-03", "2026-02-03", "--sum-by", "daily", "--format", "json", "--timings"]
+
+            first = self.run_cli(args, env)
+            self.assertEqual(first.returncode, 0, msg=first.stderr)
+            first_payload = json.loads(first.stdout)
+            self.assertEqual(first_payload["rows"][0]["total_tokens"], 107)
+
+            with sqlite3.connect(index_path) as conn:
+                raw_rows = conn.execute("SELECT COUNT(*) FROM usage_records").fetchone()[0]
+                sealed_files = conn.execute(
+                    "SELECT source_path FROM indexed_files WHERE sealed = 1 ORDER BY source_path"
+                ).fetchall()
+                sealed_minutes = conn.execute(
+                    "SELECT events, total_tokens FROM sealed_usage WHERE session = ? ORDER BY minute_us",
+                    ("codex-session-1",),
+                ).fetchall()
+            self.assertEqual(raw_rows, 0)
+            self.assertEqual(sealed_files, [(str(archived_path),), (str(idle_path),)])
+            self.assertEqual(sealed_minutes, [(2, 60), (1, 40)])
+
+            _write_jsonl(
+                resumed_path,
+                [
+                    {"type": "session_meta", "payload": {"cwd": "/repo/demo", "id": "codex-session-1"}},
+                    token_row("2026-02-03T09:10:00-08:00", 100),
+                    token_row("2026-02-03T12:00:00-08:00", 150),
+                ],
+            )
+            second = self.run_cli(args, env)
+            self.assertEqual(second.returncode, 0, msg=second.stderr)
+            second_payload = json.loads(second.stdout)
+            self.assertEqual(second_payload["rows"][0]["total_tokens"], 157)
+            counters = second_payload["timings"]["counters"]
+            self.assertEqual(counters["files_sealed"], 2)
+            # Sealed files are stat'd to catch resumed sessions, but neither rescanned nor replayed.
+            self.assertEqual(counters["files_stat"], 3)
+            self.assertEqual(counters["files_rescanned"], 1)
+
+    def test_codex_cli_reopens_sealed_file_when_session_resumes(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp_path = Path(tmp)
+            sessions_root = tmp_path / "codex-sessions"
+            index_path = tmp_path / "tokemon-index.sqlite3"
+            session_path = sessions_root / "2026/02/03/session.jsonl"
+
+            def token_row(timestamp: str, total: int) -> dict:
+                return {
+                    "timestamp": timestamp,
+                    "type": "event_msg",
+                    "payload": {
+                        "type": "token_count",
+                        "info": {"total_token_usage": {"input_tokens": total, "total_tokens": total}},
+                    },
+                }
+
+            rows = [
+                {"type": "session_meta", "payload": {"cwd": "/repo/demo", "id": "codex-session-1"}},
+                token_row("2026-02-03T09:05:00-08:00", 100),
+            ]
+            _write_jsonl(session_path, rows)
+            old_mtime = time_module.time() - 10 * 86_400
+            os.utime(session_path, (old_mtime, old_mtime))
+
+            env = {
+                "TOKEMON_CODEX_SESSIONS_ROOT": str(sessions_root),
+                "TOKEMON_CODEX_ARCHIVED_ROOT": str(tmp_path / "codex-archived"),
+                "TOKEMON_CLAUDE_PROJECTS_ROOT": str(tmp_path / "claude-projects"),
+                "TOKEMON_INDEX_PATH": str(index_path),
+            }
+            args = ["2026-02-03", "2026-02-03", "--sum-by", "daily", "--format", "json"]
+            first = self.run_cli(args, env)
+            self.assertEqual(first.returncode, 0, msg=first.stderr)
+            self.assertEqual(json.loads(first.stdout)["rows"][0]["total_tokens"], 100)
+
+            _write_jsonl(session_path, [*rows, token_row("2026-02-03T15:00:00-08:00", 900)])
+            resumed = self.run_cli(args, env)
+            self.assertEqual(resumed.returncode, 0, msg=resumed.stderr)
+            self.assertEqual(json.loads(resumed.stdout)["rows"][0]["total_tokens"], 900)
+
+            # Once idle again, the file is resealed from its full contents without double counting.
+            os.utime(session_path, (old_mtime, old_mtime))
+            resealed = self.run_cli(args, env)
+            self.assertEqual(resealed.returncode, 0, msg=resealed.stderr)
+            self.assertEqual(json.loads(resealed.stdout)["rows"][0]["total_tokens"], 900)
+            with sqlite3.connect(index_path) as conn:
+                sealed_minutes = conn.execute("SELECT SUM(total_tokens) FROM sealed_usage").fetchone()[0]
+            self.assertEqual(sealed_minutes, 900)
+
+    def test_stats_reads_sealed_files_per_event(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp_path = Path(tmp)
+            archived_root = tmp_path / "codex-archived"
+            rows = [{"type": "session_meta", "payload": {"cwd": "/repo/demo", "id": "codex-session-1"}}]
+            running_total = 0
+            for second, delta in enumerate([5, 10, 20, 300, 302, 2101]):
+                running_total += delta
+                rows.append(
+                    {
+                        "timestamp": f"2026-02-03T09:05:{second * 5:02d}-08:00",
+                        "type": "event_msg",
+                        "payload": {
+                            "type": "token_count",
+                            "info": {"total_token_usage": {"input_tokens": running_total, "total_tokens": running_total}},
+                        },
+                    }
+                )
+            _write_jsonl(archived_root / "rollout-2026-02-03T09-00-00.jsonl", rows)
+
+            env = {
+                "TOKEMON_CODEX_SESSIONS_ROOT": str(tmp_path / "codex-sessions"),
+                "TOKEMON_CODEX_ARCHIVED_ROOT": str(archived_root),
+                "TOKEMON_CLAUDE_PROJECTS_ROOT": str(tmp_path / "claude-projects"),
+                "TOKEMON_INDEX_PATH": str(tmp_path / "tokemon-index.sqlite3"),
+            }
+            args = ["2026-02-03", "2026-02-03", "--sum-by", "daily", "--stats", "--format", "json"]
+            raw = self.run_cli(args, {**env, "TOKEMON_DISABLE_INDEX": "1"})
+            cold = self.run_cli(args, env)
+            warm = self.run_cli(args, env)
+
+            with sqlite3.connect(tmp_path / "tokemon-index.sqlite3") as conn:
+                sealed_files = conn.execute("SELECT COUNT(*) FROM indexed_files WHERE sealed = 1").fetchone()[0]
+            self.assertEqual(sealed_files, 1)
+            for result in (raw, cold, warm):
+                self.assertEqual(result.returncode, 0, msg=result.stderr)
+                row = json.loads(result.stdout)["rows"][0]
+                self.assertEqual(row["events"], 6)
+                self.assertEqual(row["input_tokens"], 2738)
+                self.assertAlmostEqual(row["input_tokens_p50"], 20, delta=1)
+
+    def test_index_subcommands_report_verify_vacuum_and_rebuild(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp_path = Path(tmp)
+            sessions_root = tmp_path / "codex-sessions"
+            index_path = tmp_path / "tokemon-index.sqlite3"
+            kept_path = sessions_root / "2026/02/03/kept.jsonl"
+            removed_path = sessions_root / "2026/02/03/removed.jsonl"
+
+            for path, session_id in [(kept_path, "codex-session-kept"), (removed_path, "codex-session-removed")]:
+                _write_jsonl(
+                    path,
+                    [
+                        {"type": "session_meta", "payload": {"cwd": "/repo/demo", "id": session_id}},
+                        {
+                            "timestamp": "2026-02-03T09:10:00-08:00",
+                            "type": "event_msg",
+                            "payload": {
+                                "type": "token_count",
+                                "info": {"total_token_usage": {"input_tokens": 80, "total_tokens": 80}},
+                            },
+                        },
+                    ],
+                )
+
+            env = {
+                "TOKEMON_CODEX_SESSIONS_ROOT": str(sessions_root),
+                "TOKEMON_CODEX_ARCHIVED_ROOT": str(tmp_path / "codex-archived"),
+                "TOKEMON_CLAUDE_PROJECTS_ROOT": str(tmp_path / "claude-projects"),
+                "TOKEMON_INDEX_PATH": str(index_path),
+            }
+
+            missing = self.run_cli(["index", "status"], env)
+            self.assertEqual(missing.returncode, 1)
+            self.assertIn("no index", missing.stderr)
+
+            report = self.run_cli(["2026-02-03", "2026-02-03"], env)
+            self.assertEqual(report.returncode, 0, msg=report.stderr)
+
+            status = self.run_cli(["index", "status", "--format", "json"], env)
+            self.assertEqual(status.returncode, 0, msg=status.stderr)
+            status_payload = json.loads(status.stdout)
+            self.assertEqual(status_payload["schema_version"], 3)
+            self.assertEqual(status_payload["indexed_files"], 2)
+            self.assertEqual(status_payload["usage_records"], 2)
+            self.assertEqual(status_payload["stale_files"], 0)
+            self.assertIn("fragmentation", status_payload)
+
+            clean = self.run_cli(["index", "verify", "--sample", "5"], env)
+            self.assertEqual(clean.returncode, 0, msg=clean.stdout + clean.stderr)
+            self.assertIn("checked: 2", clean.stdout)
+
+            with sqlite3.connect(index_path) as conn:
+                conn.execute(
+                    "UPDATE usage_records SET total_tokens = 999 WHERE source_path = ?",
+                    (str(kept_path),),
+                )
+            drifted = self.run_cli(["index", "verify", "--format", "json"], env)
+            self.assertEqual(drifted.returncode, 1, msg=drifted.stderr)
+            self.assertEqual(
+                json.loads(drifted.stdout)["problems"],
+                [{"path": str(kept_path), "status": "drift"}],
+            )
+
+            removed_path.unlink()
+            vacuum = self.run_cli(["index", "vacuum", "--format", "json"], env)
+            self.assertEqual(vacuum.returncode, 0, msg=vacuum.stderr)
+            self.assertEqual(json.loads(vacuum.stdout)["pruned_missing_files"], 1)
+
+            rebuild = self.run_cli(["index", "rebuild", "--format", "json"], env)
+            self.assertEqual(rebuild.returncode, 0, msg=rebuild.stderr)
+            self.assertEqual(json.loads(rebuild.stdout)["indexed_files"], 1)
+            self.assertEqual(sorted(path.name for path in tmp_path.glob("tokemon-index.sqlite3.rebuild-*")), [])
+
+            with sqlite3.connect(index_path) as conn:
+                rebuilt_rows = conn.execute("SELECT source_path, total_tokens FROM usage_records").fetchall()
+            self.assertEqual(rebuilt_rows, [(str(kept_path), 80)])
+            verified = self.run_cli(["index", "verify"], env)
+            self.assertEqual(verified.returncode, 0, msg=verified.stdout + verified.stderr)
+
+            with sqlite3.connect(index_path) as conn:
+                conn.execute("PRAGMA user_version = 1")
+            for action in ("status", "verify", "vacuum"):
+                mismatched = self.run_cli(["index", action], env)
+                self.assertEqual(mismatched.returncode, 1, msg=mismatched.stdout)
+                self.assertIn("schema version 1, expected 3", mismatched.stderr)
+            with sqlite3.connect(index_path) as conn:
+                self.assertEqual(conn.execute("SELECT COUNT(*) FROM usage_records").fetchone()[0], 1)
+
+    def test_index_rebuild_waits_for_writers_and_keeps_live_wal_consistent(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp_path = Path(tmp)
+            sessions_root = tmp_path / "codex-sessions"
+            index_path = tmp_path / "tokemon-index.sqlite3"
+            _write_jsonl(
+                sessions_root / "2026/02/03/session.jsonl",
+                [
+                    {"type": "session_meta", "payload": {"cwd": "/repo/demo", "id": "codex-session-1"}},
+                    {
+                        "timestamp": "2026-02-03T09:10:00-08:00",
+                        "type": "event_msg",
+                        "payload": {
+                            "type": "token_count",
+                            "info": {"total_token_usage": {"input_tokens": 80, "total_tokens": 80}},
+                        },
+                    },
+                ],
+            )
+            env = {
+                "TOKEMON_CODEX_SESSIONS_ROOT": str(sessions_root),
+                "TOKEMON_CODEX_ARCHIVED_ROOT": str(tmp_path / "codex-archived"),
+                "TOKEMON_CLAUDE_PROJECTS_ROOT": str(tmp_path / "claude-projects"),
+                "TOKEMON_INDEX_PATH": str(index_path),
+            }
+            report = self.run_cli(["2026-02-03", "2026-02-03"], env)
+            self.assertEqual(report.returncode, 0, msg=report.stderr)
+
+            # Another process holds the live index open, with an uncheckpointed commit in its WAL.
+            writer = sqlite3.connect(index_path)
+            self.addCleanup(writer.close)
+            inode = index_path.stat().st_ino
+            with writer:
+                writer.execute("UPDATE usage_records SET total_tokens = 999")
+            rebuild = self.run_cli(["index", "rebuild", "--format", "json"], env)
+            self.assertEqual(rebuild.returncode, 0, msg=rebuild.stderr)
+
+            self.assertEqual(index_path.stat().st_ino, inode)
+            self.assertEqual(writer.execute("SELECT total_tokens FROM usage_records").fetchall(), [(80,)])
+            self.assertEqual(writer.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+
     def test_invalid_sum_by_exits_non_zero(self) -> None:
         with tempfile.TemporaryDirectory() as tmp:
             tmp_path = Path(tmp)